@@ -46,6 +46,8 @@ def _CommandClassToString(command_class):
 
 class BaseExpectedResult(object):
   """The base class for expected results."""
+  __slots__ = ('_action', '_warning_message', '_advisory_message')
+
   def __init__(self,
                action=None,
                warning=None,
@@ -58,7 +60,7 @@ class BaseExpectedResult(object):
       advisory: An advisory message to log is this result matches
     """
     self._action = action
-    self._warning_messae = warning
+    self._warning_message = warning
     self._advisory_message = advisory
 
   @property
@@ -67,7 +69,7 @@ class BaseExpectedResult(object):
 
   @property
   def warning(self):
-    return self._warning_messae
+    return self._warning_message
 
   @property
   def advisory(self):
@@ -86,6 +88,8 @@ class BaseExpectedResult(object):
 
 class BroadcastResult(BaseExpectedResult):
   """This checks that the request was broadcast."""
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_WAS_BROADCAST'
 
@@ -95,6 +99,8 @@ class BroadcastResult(BaseExpectedResult):
 
 class TimeoutResult(BaseExpectedResult):
   """This checks that the request timed out."""
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_TIMEOUT'
 
@@ -104,6 +110,8 @@ class TimeoutResult(BaseExpectedResult):
 
 class InvalidResponse(BaseExpectedResult):
   """This checks that we got an invalid response back."""
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_INVALID_RESPONSE'
 
@@ -113,6 +121,8 @@ class InvalidResponse(BaseExpectedResult):
 
 class UnsupportedResult(BaseExpectedResult):
   """This checks that the request was unsupported."""
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_PLUGIN_DISCOVERY_NOT_SUPPORTED'
 
@@ -123,6 +133,8 @@ class UnsupportedResult(BaseExpectedResult):
 
 class DUBResult(BaseExpectedResult):
   """Checks that the result was a DUB response."""
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_DUB_RESPONSE'
 
@@ -137,6 +149,8 @@ class SuccessfulResult(BaseExpectedResult):
   message was formed correctly. Other classes inherit from this an perform more
   specific checking.
   """
+  __slots__ = ()
+
   def __str__(self):
     return 'RDM_COMPLETED_OK'
 
@@ -146,25 +160,34 @@ class SuccessfulResult(BaseExpectedResult):
 
 class QueuedMessageResult(SuccessfulResult):
   """This checks for a valid response to a QUEUED_MESSAGE request."""
+  __slots__ = ()
+  # The value of the QUEUED_MESSAGE PID, looked up the first time it's needed
+  _queued_message_pid_value = None
+
   def __str__(self):
     return 'It\'s complicated'
 
+  @classmethod
+  def _QueuedMessagePidValue(cls):
+    if cls._queued_message_pid_value is None:
+      cls._queued_message_pid_value = GetStore().GetName('QUEUED_MESSAGE').value
+    return cls._queued_message_pid_value
+
   def Matches(self, response, unpacked_data):
     ok = super(QueuedMessageResult, self).Matches(response, unpacked_data)
 
     if not ok:
       return False
 
-    pid_store = GetStore()
-    queued_message_pid = pid_store.GetName('QUEUED_MESSAGE')
-
     return ((response.response_type == OlaClient.RDM_NACK_REASON or
              response.response_type == OlaClient.RDM_ACK) and
-             response.pid != queued_message_pid.value)
+             response.pid != self._QueuedMessagePidValue())
 
 
 class NackResult(SuccessfulResult):
   """This checks that the device nacked the request."""
+  __slots__ = ('_command_class', '_pid_id', '_nack_reason')
+
   def __init__(self,
                command_class,
                pid_id,
@@ -206,6 +229,8 @@ class NackResult(SuccessfulResult):
 
 class NackDiscoveryResult(NackResult):
   """This checks that the device nacked a Discovery request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                nack_reason,
@@ -232,6 +257,8 @@ class NackDiscoveryResult(NackResult):
 
 class NackGetResult(NackResult):
   """This checks that the device nacked a GET request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                nack_reason,
@@ -257,6 +284,8 @@ class NackGetResult(NackResult):
 
 class NackSetResult(NackResult):
   """This checks that the device nacked a SET request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                nack_reason,
@@ -282,6 +311,8 @@ class NackSetResult(NackResult):
 
 class AckResult(SuccessfulResult):
   """This checks that the device ack'ed the request."""
+  __slots__ = ('_command_class', '_pid_id', '_field_names', '_field_values')
+
   def __init__(self,
                command_class,
                pid_id,
@@ -347,6 +378,8 @@ class AckResult(SuccessfulResult):
 
 class AckDiscoveryResult(AckResult):
   """This checks that the device ack'ed a DISCOVERY request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                field_names=[],
@@ -375,6 +408,8 @@ class AckDiscoveryResult(AckResult):
 
 class AckGetResult(AckResult):
   """This checks that the device ack'ed a GET request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                field_names=[],
@@ -403,6 +438,8 @@ class AckGetResult(AckResult):
 
 class AckSetResult(AckResult):
   """This checks that the device ack'ed a SET request."""
+  __slots__ = ()
+
   def __init__(self,
                pid_id,
                field_names=[],
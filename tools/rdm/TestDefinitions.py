@@ -48,6 +48,13 @@ __author__ = 'nomis52@gmail.com (Simon Newton)'
 
 MAX_PERSONALITY_NUMBER = 255
 
+# Failure messages for when DEVICE_INFO disagrees with a more specific PID
+DMX_ADDRESS_MISMATCH_FMT = (
+    'DMX_START_ADDRESS (%d) doesn\'t match what was in DEVICE_INFO (%d)')
+PERSONALITY_MISMATCH_FMT = (
+    'Personality information in device info doesn\'t match that in '
+    'dmx_personality: %s %d != %d')
+
 
 # Mute Tests
 # -----------------------------------------------------------------------------
@@ -583,7 +590,7 @@ class GetDeviceInfoWithData(DeviceInfoTest, ResponderTestFixture):
       self.AckGetResult(
         field_names=self.FIELDS,
         field_values=self.FIELD_VALUES,
-        warning='Get %s with data returned an ack' % self.pid.name)
+        warning=TestMixins.GET_WITH_DATA_WARNING % self.pid.name)
     ])
     self.SendRawGet(ROOT_DEVICE, self.pid, 'x')
 
@@ -750,6 +757,58 @@ class GetSupportedParameters(ResponderTestFixture):
         'DNS_IPV4_NAME_SERVER', 'DNS_HOSTNAME', 'DNS_DOMAIN_NAME']),
   ]
 
+  # The values of MANDATORY_PIDS & BANNED_PIDS, mapped to the PID names, and
+  # copies of the group & dependency lists with each PID name replaced by a
+  # (name, value) tuple. These are resolved the first time the test runs, see
+  # _ResolvePids().
+  _mandatory_name_by_value = None
+  _mandatory_values = None
+  _banned_name_by_value = None
+  _banned_values = None
+  _pid_groups = None
+  _pid_dependencies = None
+  _pid_reverse_dependencies = None
+
+  @classmethod
+  def _ResolvePids(cls, pid_store):
+    """Resolve the PID names used by this test into PID values.
+
+    This only does the lookups once, subsequent calls are no-ops. Nothing is
+    stored on the class until every lookup has succeeded, so a failure part
+    way through is retried on the next call.
+    """
+    if cls._mandatory_values is not None:
+      return
+
+    mandatory_name_by_value = dict(
+        (pid_store.GetName(p).value, p) for p in cls.MANDATORY_PIDS)
+    banned_name_by_value = dict(
+        (pid_store.GetName(p).value, p) for p in cls.BANNED_PIDS)
+
+    def Resolve(pid_name):
+      # PIDs missing from the store have a value of None
+      pid = pid_store.GetName(pid_name)
+      return (pid_name, pid.value if pid is not None else None)
+
+    def ResolveDependencies(dependencies):
+      return tuple((Resolve(p), tuple(Resolve(d) for d in dependent_pids))
+                   for p, dependent_pids in dependencies)
+
+    pid_groups = tuple(tuple(Resolve(p) for p in pid_names)
+                       for pid_names in cls.PID_GROUPS)
+    pid_dependencies = ResolveDependencies(cls.PID_DEPENDENCIES)
+    pid_reverse_dependencies = ResolveDependencies(
+        cls.PID_REVERSE_DEPENDENCIES)
+
+    cls._mandatory_name_by_value = mandatory_name_by_value
+    cls._banned_name_by_value = banned_name_by_value
+    cls._banned_values = frozenset(banned_name_by_value)
+    cls._pid_groups = pid_groups
+    cls._pid_dependencies = pid_dependencies
+    cls._pid_reverse_dependencies = pid_reverse_dependencies
+    # Assigned last, since this is what marks the lookups as done
+    cls._mandatory_values = frozenset(mandatory_name_by_value)
+
   def Test(self):
     self.AddExpectedResults([
       # TODO(simon): We should cross check this against support for anything
@@ -762,42 +821,36 @@ class GetSupportedParameters(ResponderTestFixture):
   def VerifyResult(self, response, fields):
     if not response.WasAcked():
       self.SetProperty('manufacturer_parameters', [])
-      self.SetProperty('supported_parameters', [])
+      self.SetProperty('supported_parameters', frozenset())
       self.SetProperty('acks_supported_parameters', False)
       return
 
     self.SetProperty('acks_supported_parameters', True)
-    mandatory_pids = {}
-    for p in self.MANDATORY_PIDS:
-      pid = self.LookupPid(p)
-      mandatory_pids[pid.value] = pid
-
-    banned_pids = {}
-    for p in self.BANNED_PIDS:
-      pid = self.LookupPid(p)
-      banned_pids[pid.value] = pid
+    self._ResolvePids(self._pid_store)
 
     supported_parameters = []
     manufacturer_parameters = []
     count_by_pid = {}
 
+    # Bind these locally since the loop runs once per declared PID
+    banned_values = self._banned_values
+    mandatory_values = self._mandatory_values
+    add_supported = supported_parameters.append
+    add_manufacturer = manufacturer_parameters.append
+
     for item in fields['params']:
       param_id = item['param_id']
       count_by_pid[param_id] = count_by_pid.get(param_id, 0) + 1
-      if param_id in banned_pids:
+      if param_id in banned_values:
         self.AddWarning('%s listed in supported parameters' %
-                        banned_pids[param_id].name)
-        continue
-
-      if param_id in mandatory_pids:
+                        self._banned_name_by_value[param_id])
+      elif param_id in mandatory_values:
         self.AddAdvisory('%s listed in supported parameters' %
-                         mandatory_pids[param_id].name)
-        continue
-
-      supported_parameters.append(param_id)
-      if (param_id >= RDM_MANUFACTURER_PID_MIN and
-          param_id <= RDM_MANUFACTURER_PID_MAX):
-        manufacturer_parameters.append(param_id)
+                         self._mandatory_name_by_value[param_id])
+      else:
+        add_supported(param_id)
+        if RDM_MANUFACTURER_PID_MIN <= param_id <= RDM_MANUFACTURER_PID_MAX:
+          add_manufacturer(param_id)
 
     # Check for duplicate PIDs
     for pid, count in count_by_pid.iteritems():
@@ -810,61 +863,59 @@ class GetSupportedParameters(ResponderTestFixture):
           self.AddAdvisory('PID 0x%hx listed %d times in supported parameters' %
                            (pid, count))
 
+    # Other tests only check for membership, so provide this as a set
+    supported_set = frozenset(supported_parameters)
     self.SetProperty('manufacturer_parameters', manufacturer_parameters)
-    self.SetProperty('supported_parameters', supported_parameters)
+    self.SetProperty('supported_parameters', supported_set)
 
-    for pid_names in self.PID_GROUPS:
+    for pid_group in self._pid_groups:
       supported_pids = []
       unsupported_pids = []
-      for pid_name in pid_names:
-        pid = self.LookupPid(pid_name)
-        if pid.value in supported_parameters:
-          supported_pids.append(pid.name)
+      for pid_name, pid_value in pid_group:
+        if pid_value in supported_set:
+          supported_pids.append(pid_name)
         else:
-          unsupported_pids.append(pid.name)
+          unsupported_pids.append(pid_name)
 
       if supported_pids and unsupported_pids:
         self.AddAdvisory(
             '%s supported but %s is not' %
             (','.join(supported_pids), ','.join(unsupported_pids)))
 
-    for p, dependent_pids in self.PID_DEPENDENCIES:
-      pid = self.LookupPid(p)
-      if pid is None:
+    for (p, value), dependent_pids in self._pid_dependencies:
+      if value is None:
         self.SetBroken('Failed to lookup info for PID %s' % p)
         return
 
-      if pid.value not in supported_parameters:
+      if value not in supported_set:
         continue
 
       unsupported_pids = []
-      for pid_name in dependent_pids:
-        pid = self.LookupPid(pid_name)
-        if pid is None:
+      for pid_name, pid_value in dependent_pids:
+        if pid_value is None:
           self.SetBroken('Failed to lookup info for PID %s' % pid_name)
           return
 
-        if pid.value not in supported_parameters:
-          unsupported_pids.append(pid.name)
+        if pid_value not in supported_set:
+          unsupported_pids.append(pid_name)
       if unsupported_pids:
         self.AddAdvisory('%s supported but %s is not' %
                          (p, ','.join(unsupported_pids)))
 
-    for p, rev_dependent_pids in self.PID_REVERSE_DEPENDENCIES:
-      if self.LookupPid(p).value in supported_parameters:
+    for (p, value), rev_dependent_pids in self._pid_reverse_dependencies:
+      if value in supported_set:
         continue
 
       dependent_pids = []
-      for pid_name in rev_dependent_pids:
-        pid = self.LookupPid(pid_name)
-        if pid is None:
+      for pid_name, pid_value in rev_dependent_pids:
+        if pid_value is None:
           self.SetBroken('Failed to lookup info for PID %s' % pid_name)
           return
 
-        if pid.value in supported_parameters:
-          dependent_pids.append(pid.name)
+        if pid_value in supported_set:
+          dependent_pids.append(pid_name)
       if (dependent_pids and
-         (self.LookupPid(p).value in supported_parameters)):
+         (value in supported_set)):
         self.AddAdvisory('%s supported but %s is not' %
                          (','.join(unsupported_pids), p))
 
@@ -880,7 +931,7 @@ class GetSupportedParametersWithData(TestMixins.GetWithDataMixin,
       self.AddExpectedResults([
         self.NackGetResult(RDMNack.NR_FORMAT_ERROR),
         self.AckGetResult(
-          warning='Get %s with data returned an ack' % self.pid.name)
+          warning=TestMixins.GET_WITH_DATA_WARNING % self.pid.name)
       ])
     else:
       self.AddExpectedResults(self.NackGetResult(RDMNack.NR_UNKNOWN_PID))
@@ -994,6 +1045,10 @@ class FindSubDevices(ResponderTestFixture):
                      (len(self._sub_device_addresses), self._device_count))
       return
 
+    # We only ever have one request in flight. The fixture tracks a single
+    # outstanding request (see _MakeRequestKey) which the ACK_TIMER /
+    # QUEUED_MESSAGE handling relies on, and olad serializes requests on the
+    # line anyway so a window of requests wouldn't reduce the bus time.
     self.AddExpectedResults([
       self.NackGetResult(RDMNack.NR_SUB_DEVICE_OUT_OF_RANGE,
                          action=self._CheckForSubDevice),
@@ -1175,17 +1230,19 @@ class GetParameterDescription(ParamDescriptionTestFixture):
 
   def Test(self):
     self.params = self.Property('manufacturer_parameters')[:]
-    if len(self.params) == 0:
+    if not self.params:
       self.SetNotRun('No manufacturer params found')
       # This case is tested in GetParamDescriptionForNonManufacturerPid
       return
     self._GetParam()
 
   def _GetParam(self):
-    if len(self.params) == 0:
+    if not self.params:
       self.Stop()
       return
 
+    # Sent one PID at a time so VerifyResult can check the response against
+    # current_param, see the note in FindSubDevices._CheckForSubDevice.
     self.AddExpectedResults(
       self.AckGetResult(action=self._GetParam))
     self.current_param = self.params.pop()
@@ -1653,31 +1710,39 @@ class GetLanguageCapabilities(OptionalParameterTestFixture):
   PROVIDES = ['languages_capabilities']
 
   def Test(self):
-    self.languages = []
     self.AddIfGetSupported(self.AckGetResult(field_names=['languages']))
     self.SendGet(ROOT_DEVICE, self.pid)
 
   def VerifyResult(self, response, fields):
     if not response.WasAcked():
-      self.SetProperty('languages_capabilities', [])
+      self.SetProperty('languages_capabilities', ())
       return
 
-    self.languages = [f['language'] for f in fields['languages']]
-
-    if len(self.languages) == 0:
+    if not fields['languages']:
       self.AddWarning('No languages returned for LANGUAGE_CAPABILITIES')
 
+    # Advisories are issued in the order the responder declared the
+    # languages, at most once per language.
+    unique_languages = []
     language_set = set()
-    for language in self.languages:
+    duplicate_languages = set()
+    for f in fields['languages']:
+      language = f['language']
       if language in language_set:
-        self.AddAdvisory('%s listed twice in language capabilities' % language)
+        if language not in duplicate_languages:
+          self.AddAdvisory('%s listed twice in language capabilities' %
+                           language)
+          duplicate_languages.add(language)
+        continue
       language_set.add(language)
+      unique_languages.append(language)
       if ContainsUnprintable(language):
         self.AddAdvisory(
             'Language name in languague capabilities contains unprintable '
             'characters, was %s' % language.encode('string-escape'))
 
-    self.SetProperty('languages_capabilities', language_set)
+    # Keep the order the responder declared the languages in, minus duplicates
+    self.SetProperty('languages_capabilities', tuple(unique_languages))
 
 
 class GetLanguageCapabilitiesWithData(TestMixins.GetWithDataMixin,
@@ -1734,16 +1799,18 @@ class SetLanguage(OptionalParameterTestFixture):
     ack = self.AckSetResult(action=self.VerifySet)
     nack = self.NackSetResult(RDMNack.NR_UNSUPPORTED_COMMAND_CLASS)
 
-    available_langugages = list(self.Property('languages_capabilities'))
-    if available_langugages:
-      if len(available_langugages) > 1:
+    available_languages = self.Property('languages_capabilities')
+    if available_languages:
+      if len(available_languages) > 1:
         # If the responder only supports 1 lang, we may not be able to set it
         self.AddIfSetSupported(ack)
-        self.new_language = available_langugages[0]
-        if self.new_language == self.Property('language'):
-          self.new_language = available_langugages[1]
+        current_language = self.Property('language')
+        self.new_language = next(
+            (language for language in available_languages
+             if language != current_language),
+            available_languages[0])
       else:
-        self.new_language = available_langugages[0]
+        self.new_language = available_languages[0]
         self.AddIfSetSupported([ack, nack])
     else:
       # Get languages returned no languages so we expect a nack
@@ -1952,16 +2019,15 @@ class GetDMXPersonality(OptionalParameterTestFixture):
 
     current_personality = self.Property('current_personality')
     personality_count = self.Property('personality_count')
-    warning_str = ("Personality information in device info doesn't match that "
-                   "in dmx_personality")
 
     if current_personality != fields['current_personality']:
-      self.SetFailed('%s: current_personality %d != %d' % (
-        warning_str, current_personality, fields['current_personality']))
+      self.SetFailed(PERSONALITY_MISMATCH_FMT % (
+        'current_personality', current_personality,
+        fields['current_personality']))
 
     if personality_count != fields['personality_count']:
-      self.SetFailed('%s: personality_count %d != %d' % (
-        warning_str, personality_count, fields['personality_count']))
+      self.SetFailed(PERSONALITY_MISMATCH_FMT % (
+        'personality_count', personality_count, fields['personality_count']))
 
 
 class GetDMXPersonalityWithData(TestMixins.GetWithDataMixin,
@@ -1978,13 +2044,10 @@ class SetDMXPersonality(OptionalParameterTestFixture):
 
   def Test(self):
     self._personalities = list(self.Property('personalities'))
-    self._consumes_slots = False
-    for personality in self._personalities:
-      if personality['slots_required'] > 0:
-        self._consumes_slots = True
-        break
+    self._consumes_slots = any(personality['slots_required'] > 0
+                               for personality in self._personalities)
 
-    if len(self._personalities) > 0:
+    if self._personalities:
       self._CheckPersonality()
       return
 
@@ -2059,9 +2122,7 @@ class SetDMXPersonality(OptionalParameterTestFixture):
     if personality == 0 or personality > 255:
       return
 
-    self.SendSet(ROOT_DEVICE,
-                 self.pid,
-                 [self.Property('current_personality')])
+    self.SendSet(ROOT_DEVICE, self.pid, [personality])
     self._wrapper.Run()
 
 
@@ -2163,6 +2224,7 @@ class GetDMXPersonalityDescriptions(OptionalParameterTestFixture):
   PID = 'DMX_PERSONALITY_DESCRIPTION'
   REQUIRES = ['personality_count']
   PROVIDES = ['personalities']
+  FIELDS = ['slots_required', 'name']
 
   def Test(self):
     self._personalities = []
@@ -2185,7 +2247,7 @@ class GetDMXPersonalityDescriptions(OptionalParameterTestFixture):
       return
 
     self.AddIfGetSupported(self.AckGetResult(
-        field_names=['slots_required', 'name'],
+        field_names=self.FIELDS,
         field_values={'personality': self._current_index},
         action=self._GetPersonality))
     self.SendGet(ROOT_DEVICE, self.pid, [self._current_index])
@@ -2255,10 +2317,10 @@ class GetDMXStartAddress(ResponderTestFixture):
       self.SetProperty('dmx_address', None)
       return
 
-    if self.Property('dmx_start_address') != fields['dmx_address']:
-      self.SetFailed(
-          'DMX_START_ADDRESS (%d) doesn\'t match what was in DEVICE_INFO (%d)'
-          % (fields['dmx_address'], self.Property('dmx_start_address')))
+    device_info_address = self.Property('dmx_start_address')
+    if device_info_address != fields['dmx_address']:
+      self.SetFailed(DMX_ADDRESS_MISMATCH_FMT %
+                     (fields['dmx_address'], device_info_address))
     self.SetPropertyFromDict(fields, 'dmx_address')
 
 
@@ -2275,7 +2337,7 @@ class GetDMXStartAddressWithData(TestMixins.GetWithDataMixin,
       results = [
         self.NackGetResult(RDMNack.NR_FORMAT_ERROR),
         self.AckGetResult(
-          warning='Get %s with data returned an ack' % self.pid.name)
+          warning=TestMixins.GET_WITH_DATA_WARNING % self.pid.name)
       ]
     else:
       # If we don't have a footprint, PID may return something, or may return
@@ -2284,7 +2346,7 @@ class GetDMXStartAddressWithData(TestMixins.GetWithDataMixin,
         self.NackGetResult(RDMNack.NR_UNKNOWN_PID),
         self.NackGetResult(RDMNack.NR_FORMAT_ERROR),
         self.AckGetResult(
-          warning='Get %s with data returned an ack' % self.pid.name),
+          warning=TestMixins.GET_WITH_DATA_WARNING % self.pid.name),
       ]
     self.AddExpectedResults(results)
     self.SendRawGet(PidStore.ROOT_DEVICE, self.pid, self.DATA)
@@ -2351,6 +2413,7 @@ class SetOutOfRangeDMXStartAddress(ResponderTestFixture):
   # still allowing this test to run if the other test fails.
   DEPS = [GetDMXStartAddress]
   REQUIRES = ['dmx_footprint']
+  DATA = struct.pack('!H', TestMixins.MAX_DMX_ADDRESS + 1)
 
   def Test(self):
     if self.Property('dmx_footprint') > 0:
@@ -2361,8 +2424,7 @@ class SetOutOfRangeDMXStartAddress(ResponderTestFixture):
           self.NackSetResult(RDMNack.NR_UNSUPPORTED_COMMAND_CLASS),
           self.NackSetResult(RDMNack.NR_DATA_OUT_OF_RANGE)
       ])
-    data = struct.pack('!H', TestMixins.MAX_DMX_ADDRESS + 1)
-    self.SendRawSet(ROOT_DEVICE, self.pid, data)
+    self.SendRawSet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class SetZeroDMXStartAddress(ResponderTestFixture):
@@ -2373,6 +2435,7 @@ class SetZeroDMXStartAddress(ResponderTestFixture):
   # still allowing this test to run if the other test fails.
   DEPS = [GetDMXStartAddress]
   REQUIRES = ['dmx_footprint']
+  DATA = struct.pack('!H', 0)
 
   def Test(self):
     if self.Property('dmx_footprint') > 0:
@@ -2383,8 +2446,7 @@ class SetZeroDMXStartAddress(ResponderTestFixture):
           self.NackSetResult(RDMNack.NR_UNSUPPORTED_COMMAND_CLASS),
           self.NackSetResult(RDMNack.NR_DATA_OUT_OF_RANGE)
       ])
-    data = struct.pack('!H', 0)
-    self.SendRawSet(ROOT_DEVICE, self.pid, data)
+    self.SendRawSet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class SetDMXStartAddressWithNoData(TestMixins.SetWithNoDataMixin,
@@ -2898,11 +2960,11 @@ class GetInvalidSensorDefinition(OptionalParameterTestFixture):
   """Get the sensor definition with the all sensor value (0xff)."""
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'SENSOR_DEFINITION'
+  DATA = struct.pack('!B', 0xff)
 
   def Test(self):
     self.AddIfGetSupported(self.NackGetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    data = struct.pack('!B', 0xff)
-    self.SendRawGet(ROOT_DEVICE, self.pid, data)
+    self.SendRawGet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class SetSensorDefinition(TestMixins.UnsupportedSetMixin,
@@ -3054,11 +3116,11 @@ class GetInvalidSensorValue(OptionalParameterTestFixture):
   """Get the sensor value with the all sensor value (0xff)."""
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'SENSOR_VALUE'
+  DATA = struct.pack('!B', 0xff)
 
   def Test(self):
     self.AddIfGetSupported(self.NackGetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    data = struct.pack('!B', 0xff)
-    self.SendRawGet(ROOT_DEVICE, self.pid, data)
+    self.SendRawGet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class GetSensorValueWithNoData(TestMixins.GetWithNoDataMixin,
@@ -3926,28 +3988,30 @@ class GetRealTimeClock(OptionalParameterTestFixture):
   CATEGORY = TestCategory.CONFIGURATION
   PID = 'REAL_TIME_CLOCK'
 
-  ALLOWED_RANGES = {
-      'year': (2003, 65535),
-      'month': (1, 12),
-      'day': (1, 31),
-      'hour': (0, 23),
-      'minute': (0, 59),
-  }
+  FIELDS = ['year', 'month', 'day', 'hour', 'minute', 'second']
+
+  # (field, min, max) for each of the fields we range check
+  ALLOWED_RANGES = (
+      ('year', 2003, 65535),
+      ('month', 1, 12),
+      ('day', 1, 31),
+      ('hour', 0, 23),
+      ('minute', 0, 59),
+  )
 
   def Test(self):
-    self.AddIfGetSupported(
-      self.AckGetResult(field_names=self.ALLOWED_RANGES.keys() + ['second']))
+    self.AddIfGetSupported(self.AckGetResult(field_names=self.FIELDS))
     self.SendGet(ROOT_DEVICE, self.pid)
 
   def VerifyResult(self, response, fields):
     if not response.WasAcked():
       return
 
-    for field, valid_range in self.ALLOWED_RANGES.iteritems():
+    for field, min_value, max_value in self.ALLOWED_RANGES:
       value = fields[field]
-      if value < valid_range[0] or value > valid_range[1]:
+      if value < min_value or value > max_value:
         self.AddWarning('%s in GET %s is out of range, was %d, expected %s' %
-                        (field, self.pid.name, value, valid_range))
+                        (field, self.pid.name, value, (min_value, max_value)))
 
 
 class GetRealTimeClockWithData(TestMixins.GetWithDataMixin,
@@ -3962,14 +4026,13 @@ class SetRealTimeClock(OptionalParameterTestFixture):
   PID = 'REAL_TIME_CLOCK'
 
   def Test(self):
-    n = datetime.datetime.now()
     self.AddIfSetSupported([
         self.AckSetResult(),
         self.NackSetResult(RDMNack.NR_UNSUPPORTED_COMMAND_CLASS),
     ])
-    args = [n.year, n.month, n.day, n.hour, n.minute, n.second]
-    self.SendSet(ROOT_DEVICE, self.pid,
-                 args)
+    # year, month, day, hour, minute, second
+    args = list(datetime.datetime.now().timetuple()[:6])
+    self.SendSet(ROOT_DEVICE, self.pid, args)
 
 
 class SetRealTimeClockWithNoData(OptionalParameterTestFixture):
@@ -4177,12 +4240,16 @@ class GetPowerState(TestMixins.GetMixin, OptionalParameterTestFixture):
   EXPECTED_FIELDS = ['power_state']
 
   # The allowed power states
-  ALLOWED_STATES = [0, 1, 2, 0xff]
+  ALLOWED_STATES = (0, 1, 2, 0xff)
+  ALLOWED_STATES_SET = frozenset(ALLOWED_STATES)
+  # Maps each allowed power state to the next one, wrapping around at the end
+  NEXT_STATE = dict(zip(ALLOWED_STATES,
+                        ALLOWED_STATES[1:] + ALLOWED_STATES[:1]))
 
   def VerifyResult(self, response, fields):
     super(GetPowerState, self).VerifyResult(response, fields)
     if response.WasAcked():
-      if fields['power_state'] not in self.ALLOWED_STATES:
+      if fields['power_state'] not in self.ALLOWED_STATES_SET:
         self.AddWarning('Power state of 0x%hx is not defined' %
                         fields['power_state'])
 
@@ -4199,22 +4266,39 @@ class SetPowerState(TestMixins.SetMixin, OptionalParameterTestFixture):
   PID = 'POWER_STATE'
   REQUIRES = ['power_state']
   EXPECTED_FIELDS = ['power_state']
+  # Set if the device rejected our SET as an unsupported command class. In
+  # every other case (ack, timeout, bad response) the power state may have
+  # changed, so it's restored.
+  _set_rejected = False
 
   def OldValue(self):
     old = self.Property('power_state')
-    if old in GetPowerState.ALLOWED_STATES:
+    if old in GetPowerState.ALLOWED_STATES_SET:
       return old
     return GetPowerState.ALLOWED_STATES[0]
 
   def NewValue(self):
-    old_value = self.Property('power_state')
-    try:
-      GetPowerState.ALLOWED_STATES.index(old_value)
-    except ValueError:
-      return GetPowerState.ALLOWED_STATES[0]
+    return GetPowerState.NEXT_STATE.get(self.Property('power_state'),
+                                        GetPowerState.ALLOWED_STATES[0])
+
+  def Test(self):
+    self.AddIfSetSupported([
+      self.AckSetResult(action=self.VerifySet),
+      self.NackSetResult(
+        RDMNack.NR_UNSUPPORTED_COMMAND_CLASS,
+        action=self._SetRejected,
+        advisory='SET for %s returned unsupported command class' %
+                 self.pid.name),
+    ])
+    self.SendSet(ROOT_DEVICE, self.pid, [self.NewValue()])
 
-    length = len(GetPowerState.ALLOWED_STATES)
-    return GetPowerState.ALLOWED_STATES[(old_value + 1) % length]
+  def _SetRejected(self):
+    self._set_rejected = True
+
+  def ResetState(self):
+    if self._set_rejected:
+      return
+    super(SetPowerState, self).ResetState()
 
 
 class SetPowerStateWithNoData(TestMixins.SetWithNoDataMixin,
@@ -4460,12 +4544,12 @@ class SetZeroCapturePreset(OptionalParameterTestFixture):
   """SET CAPTURE_PRESET to scene 0 and expect a data out of range."""
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'CAPTURE_PRESET'
+  # Scene 0, no timing information
+  DATA = struct.pack('!HHHH', 0, 0, 0, 0)
 
   def Test(self):
     self.AddIfSetSupported(self.NackSetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    # Scene 0, no timing information
-    data = struct.pack('!HHHH', 0, 0, 0, 0)
-    self.SendRawSet(ROOT_DEVICE, self.pid, data)
+    self.SendRawSet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class SetCapturePresetWithNoData(TestMixins.SetWithNoDataMixin,
@@ -4724,11 +4808,11 @@ class SetOutOfRangeDMXBlockAddress(OptionalParameterTestFixture):
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'DMX_BLOCK_ADDRESS'
   DEPS = [SetDMXBlockAddress]
+  DATA = struct.pack('!H', TestMixins.MAX_DMX_ADDRESS + 1)
 
   def Test(self):
     self.AddIfSetSupported(self.NackSetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    data = struct.pack('!H', TestMixins.MAX_DMX_ADDRESS + 1)
-    self.SendRawSet(ROOT_DEVICE, self.pid, data)
+    self.SendRawSet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class SetDMXBlockAddressWithExtraData(TestMixins.SetWithDataMixin,
@@ -6711,22 +6795,22 @@ class GetPresetStatusPresetOff(OptionalParameterTestFixture):
   # AKA GetZeroPresetStatus
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'PRESET_STATUS'
+  DATA = struct.pack('!H', 0)
 
   def Test(self):
     self.AddIfGetSupported(self.NackGetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    data = struct.pack('!H', 0)
-    self.SendRawGet(ROOT_DEVICE, self.pid, data)
+    self.SendRawGet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class GetPresetStatusPresetScene(OptionalParameterTestFixture):
   """Get the PRESET_STATUS for PRESET_PLAYBACK_SCENE."""
   CATEGORY = TestCategory.ERROR_CONDITIONS
   PID = 'PRESET_STATUS'
+  DATA = struct.pack('!H', 0xffff)
 
   def Test(self):
     self.AddIfGetSupported(self.NackGetResult(RDMNack.NR_DATA_OUT_OF_RANGE))
-    data = struct.pack('!H', 0xffff)
-    self.SendRawGet(ROOT_DEVICE, self.pid, data)
+    self.SendRawGet(ROOT_DEVICE, self.pid, self.DATA)
 
 
 class GetOutOfRangePresetStatus(OptionalParameterTestFixture):
@@ -40,6 +40,11 @@ __author__ = 'nomis52@gmail.com (Simon Newton)'
 
 MAX_DMX_ADDRESS = DMX_UNIVERSE_SIZE
 
+# Warnings for when a responder acks a request that shouldn't have had any
+# param data. These take the PID name.
+GET_WITH_DATA_WARNING = 'Get %s with data returned an ack'
+SET_WITH_DATA_WARNING = 'Set %s with data returned an ack'
+
 
 # Generic GET Mixins
 # These don't care about the format of the message.
@@ -230,7 +235,7 @@ class GetWithDataMixin(ResponderTestFixture):
     results = [
       self.NackGetResult(RDMNack.NR_FORMAT_ERROR),
       self.AckGetResult(
-        warning='Get %s with data returned an ack' % self.pid.name)
+        warning=GET_WITH_DATA_WARNING % self.pid.name)
     ]
     for nack in self.ALLOWED_NACKS:
       results.append(self.NackGetResult(nack))
@@ -249,7 +254,7 @@ class GetMandatoryPIDWithDataMixin(ResponderTestFixture):
     self.AddExpectedResults([
       self.NackGetResult(RDMNack.NR_FORMAT_ERROR),
       self.AckGetResult(
-        warning='Get %s with data returned an ack' % self.pid.name)
+        warning=GET_WITH_DATA_WARNING % self.pid.name)
     ])
     self.SendRawGet(PidStore.ROOT_DEVICE, self.pid, self.DATA)
 
@@ -321,7 +326,7 @@ class SetWithDataMixin(ResponderTestFixture):
       # support of the PID
       self.NackSetResult(RDMNack.NR_UNSUPPORTED_COMMAND_CLASS),
       self.AckSetResult(
-        warning='Set %s with data returned an ack' % self.pid.name)
+        warning=SET_WITH_DATA_WARNING % self.pid.name)
     ]
     for nack in self.ALLOWED_NACKS:
       results.append(self.NackSetResult(nack))
@@ -607,8 +612,7 @@ class SetDMXStartAddressMixin(ResponderTestFixture):
       return
     self._test_state = self.RESET
     self.AddExpectedResults(self.AckSetResult())
-    self.SendSet(PidStore.ROOT_DEVICE, self.pid,
-                 [self.Property('dmx_address')])
+    self.SendSet(PidStore.ROOT_DEVICE, self.pid, [old_address])
     self._wrapper.Run()
 
 